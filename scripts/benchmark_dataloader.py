@@ -7,26 +7,41 @@ from pathlib import Path
 from data.dataset import TextDataset
 
 
-def benchmark_dataloader(data_dir: str, batch_size: int, num_workers: int, num_batches: int = 100):
+def benchmark_dataloader(
+    data_dir: str,
+    batch_size: int,
+    num_workers: int,
+    num_batches: int = 100,
+    prefetch_factor: int = 2,
+):
     print(f"Benchmarking DataLoader:")
     print(f"  Data dir: {data_dir}")
     print(f"  Batch size: {batch_size}")
     print(f"  Num workers: {num_workers}")
     print(f"  Num batches: {num_batches}")
+    print(f"  Prefetch factor: {prefetch_factor}")
 
     dataset = TextDataset(data_dir=data_dir, block_size=1024)
     print(f"  Dataset size: {len(dataset)} samples")
 
+    # persistent_workers keeps workers (and their memmaps) alive across the
+    # warmup -> benchmark transition so worker restart cost is not measured.
+    # Note: pinned memory grows with prefetch_factor * num_workers, so keep
+    # the prefetch depth moderate.
     dataloader = DataLoader(
         dataset,
         batch_size=batch_size,
+        shuffle=True,
         num_workers=num_workers,
         pin_memory=True,
-        prefetch_factor=2 if num_workers > 0 else None,
+        persistent_workers=num_workers > 0,
+        prefetch_factor=prefetch_factor if num_workers > 0 else None,
+        drop_last=True,
+        collate_fn=dataset.collate,
     )
 
     print(f"\nWarming up...")
-    for i, (x, y) in enumerate(dataloader):
+    for i, batch in enumerate(dataloader):
         if i >= 10:
             break
 
@@ -34,11 +49,11 @@ def benchmark_dataloader(data_dir: str, batch_size: int, num_workers: int, num_b
     start_time = time.time()
     total_tokens = 0
 
-    for i, (x, y) in enumerate(dataloader):
+    for i, batch in enumerate(dataloader):
         if i >= num_batches:
             break
 
-        total_tokens += x.numel()
+        total_tokens += batch[:, :-1].numel()
 
         if (i + 1) % 10 == 0:
             elapsed = time.time() - start_time
@@ -67,6 +82,7 @@ if __name__ == "__main__":
     parser.add_argument("--batch-size", type=int, default=32, help="Batch size")
     parser.add_argument("--num-workers", type=int, default=4, help="Number of data loading workers")
     parser.add_argument("--num-batches", type=int, default=100, help="Number of batches to benchmark")
+    parser.add_argument("--prefetch-factor", type=int, default=2, help="Batches prefetched per worker")
     args = parser.parse_args()
 
-    benchmark_dataloader(args.data_dir, args.batch_size, args.num_workers, args.num_batches)
+    benchmark_dataloader(args.data_dir, args.batch_size, args.num_workers, args.num_batches, args.prefetch_factor)
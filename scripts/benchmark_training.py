@@ -1,5 +1,7 @@
 import argparse
 import time
+from contextlib import nullcontext
+
 import torch
 import yaml
 from pathlib import Path
@@ -7,28 +9,53 @@ from pathlib import Path
 from models.gpt import GPT, GPTConfig
 
 
-def benchmark_training(config_path: str, steps: int = 100):
+def benchmark_training(config_path: str, steps: int = 100, dtype: str = "float32", compile_model: bool = False):
     with open(config_path, "r") as f:
         config = yaml.safe_load(f)
 
     device = "cuda" if torch.cuda.is_available() else "cpu"
     print(f"Device: {device}")
+    print(f"Dtype: {dtype}, compile: {compile_model}")
 
     if device == "cuda":
         print(f"GPU: {torch.cuda.get_device_name(0)}")
         print(f"GPU Memory: {torch.cuda.get_device_properties(0).total_memory / 1e9:.2f} GB")
 
+    torch.set_float32_matmul_precision("high")
+
     model_config = GPTConfig(**config["model"])
     model = GPT(model_config).to(device)
 
+    if compile_model:
+        model = torch.compile(model, mode="max-autotune")
+
+    ptdtype = {
+        "float32": torch.float32,
+        "bfloat16": torch.bfloat16,
+        "float16": torch.float16,
+    }[dtype]
+    ctx = (
+        nullcontext()
+        if device == "cpu" or dtype == "float32"
+        else torch.autocast(device_type="cuda", dtype=ptdtype)
+    )
+    # Only fp16 needs loss scaling; bf16 has enough exponent range.
+    scaler = torch.amp.GradScaler(device, enabled=(dtype == "float16"))
+
     num_params = sum(p.numel() for p in model.parameters())
     print(f"Model parameters: {num_params/1e6:.2f}M")
 
     batch_size = config["training"]["batch_size"]
     block_size = model_config.block_size
 
-    x = torch.randint(0, model_config.vocab_size, (batch_size, block_size), device=device)
-    y = torch.randint(0, model_config.vocab_size, (batch_size, block_size), device=device)
+    # Keep the batch on pinned host memory and copy it up every step with
+    # non_blocking=True, the same H2D pattern real training uses, so the
+    # benchmark includes (and overlaps) the transfer cost.
+    x_cpu = torch.randint(0, model_config.vocab_size, (batch_size, block_size))
+    y_cpu = torch.randint(0, model_config.vocab_size, (batch_size, block_size))
+    if device == "cuda":
+        x_cpu = x_cpu.pin_memory()
+        y_cpu = y_cpu.pin_memory()
 
     model.train()
     optimizer = model.configure_optimizers(
@@ -40,22 +67,34 @@ def benchmark_training(config_path: str, steps: int = 100):
 
     print(f"\nWarming up...")
     for _ in range(10):
-        logits, loss = model(x, y)
-        loss.backward()
-        optimizer.step()
-        optimizer.zero_grad()
+        x = x_cpu.to(device, non_blocking=True)
+        y = y_cpu.to(device, non_blocking=True)
+        with ctx:
+            logits, loss = model(x, y)
+        scaler.scale(loss).backward()
+        scaler.step(optimizer)
+        scaler.update()
+        optimizer.zero_grad(set_to_none=True)
 
     if device == "cuda":
         torch.cuda.synchronize()
 
     print(f"\nBenchmarking {steps} steps...")
+    # Accumulate the loss on device; a per-step .item() would force a
+    # cudaStreamSynchronize and skew the measured throughput.
+    loss_accum = torch.zeros((), device=device)
     start_time = time.time()
 
     for step in range(steps):
-        logits, loss = model(x, y)
-        loss.backward()
-        optimizer.step()
-        optimizer.zero_grad()
+        x = x_cpu.to(device, non_blocking=True)
+        y = y_cpu.to(device, non_blocking=True)
+        with ctx:
+            logits, loss = model(x, y)
+        scaler.scale(loss).backward()
+        scaler.step(optimizer)
+        scaler.update()
+        optimizer.zero_grad(set_to_none=True)
+        loss_accum += loss.detach()
 
         if (step + 1) % 10 == 0:
             if device == "cuda":
@@ -64,7 +103,7 @@ def benchmark_training(config_path: str, steps: int = 100):
             steps_per_sec = (step + 1) / elapsed
             tokens_per_sec = steps_per_sec * batch_size * block_size
 
-            print(f"Step {step+1}/{steps}: {steps_per_sec:.2f} steps/s, {tokens_per_sec/1000:.1f}K tokens/s")
+            print(f"Step {step+1}/{steps}: {steps_per_sec:.2f} steps/s, {tokens_per_sec/1000:.1f}K tokens/s, loss {float(loss_accum)/(step+1):.4f}")
 
     if device == "cuda":
         torch.cuda.synchronize()
@@ -92,6 +131,14 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Benchmark training performance")
     parser.add_argument("--config", type=str, required=True, help="Path to config file")
     parser.add_argument("--steps", type=int, default=100, help="Number of steps to benchmark")
+    parser.add_argument(
+        "--dtype",
+        type=str,
+        default="float32",
+        choices=["float32", "bfloat16", "float16"],
+        help="Autocast dtype for the benchmark",
+    )
+    parser.add_argument("--compile", action="store_true", help="Wrap the model in torch.compile")
     args = parser.parse_args()
 
-    benchmark_training(args.config, args.steps)
+    benchmark_training(args.config, args.steps, args.dtype, args.compile)
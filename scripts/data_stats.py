@@ -1,25 +1,60 @@
 import argparse
+import mmap
+
 import numpy as np
 import json
 from pathlib import Path
 
+try:
+    import numba
+
+    @numba.njit(parallel=True, cache=True)
+    def _parallel_bincount_u16(data):
+        n = data.shape[0]
+        num_threads = numba.get_num_threads()
+        local_counts = np.zeros((num_threads, 65536), dtype=np.int64)
+        for t in numba.prange(num_threads):
+            start = (n * t) // num_threads
+            end = (n * (t + 1)) // num_threads
+            for i in range(start, end):
+                local_counts[t, data[i]] += 1
+        return local_counts.sum(axis=0)
+
+    def bincount_u16(data):
+        return _parallel_bincount_u16(np.asarray(data))
+
+except ImportError:
+
+    def bincount_u16(data):
+        """Fallback when numba is not installed."""
+        return np.bincount(data, minlength=65536)
+
 
 def analyze_data(data_file: Path):
     print(f"Analyzing {data_file}...")
     data = np.memmap(data_file, dtype=np.uint16, mode="r")
+    try:
+        # One linear scan; ask the kernel for aggressive readahead.
+        data._mmap.madvise(mmap.MADV_SEQUENTIAL)
+        data._mmap.madvise(mmap.MADV_WILLNEED)
+    except (AttributeError, OSError):
+        pass
+
+    token_counts = bincount_u16(data)
+    nonzero_ids = np.flatnonzero(token_counts)
 
     stats = {
         "file": str(data_file),
         "total_tokens": int(len(data)),
         "file_size_gb": data_file.stat().st_size / (1024**3),
-        "vocab_size": int(data.max()) + 1,
-        "unique_tokens": int(len(np.unique(data))),
-        "min_token_id": int(data.min()),
-        "max_token_id": int(data.max()),
+        "vocab_size": int(nonzero_ids[-1]) + 1,
+        "unique_tokens": int(len(nonzero_ids)),
+        "min_token_id": int(nonzero_ids[0]),
+        "max_token_id": int(nonzero_ids[-1]),
     }
 
-    token_counts = np.bincount(data)
-    top_10_indices = np.argsort(token_counts)[-10:][::-1]
+    top_10_indices = np.argpartition(token_counts, -10)[-10:]
+    top_10_indices = top_10_indices[np.argsort(token_counts[top_10_indices])[::-1]]
 
     stats["top_10_tokens"] = [
         {"token_id": int(idx), "count": int(token_counts[idx])}
@@ -1,12 +1,12 @@
 import argparse
 import torch
 import yaml
-from torch.profiler import profile, record_function, ProfilerActivity
+from torch.profiler import profile, record_function, schedule, tensorboard_trace_handler, ProfilerActivity
 
 from models.gpt import GPT, GPTConfig
 
 
-def profile_training(config_path: str, steps: int = 10):
+def profile_training(config_path: str, steps: int = 10, with_stack: bool = False, record_shapes: bool = False, cuda_metrics: bool = False):
     with open(config_path, "r") as f:
         config = yaml.safe_load(f)
 
@@ -24,8 +24,10 @@ def profile_training(config_path: str, steps: int = 10):
     batch_size = config["training"]["batch_size"]
     block_size = model_config.block_size
 
-    x = torch.randint(0, model_config.vocab_size, (batch_size, block_size), device=device)
-    y = torch.randint(0, model_config.vocab_size, (batch_size, block_size), device=device)
+    # Pinned host batch + non_blocking copies so the profile shows the
+    # H2D transfer pattern real training pays for.
+    x_cpu = torch.randint(0, model_config.vocab_size, (batch_size, block_size)).pin_memory()
+    y_cpu = torch.randint(0, model_config.vocab_size, (batch_size, block_size)).pin_memory()
 
     model.train()
     optimizer = model.configure_optimizers(
@@ -37,13 +39,35 @@ def profile_training(config_path: str, steps: int = 10):
 
     print(f"\nProfiling {steps} training steps...")
 
+    # with_stack/record_shapes inflate the trace 5-10x and slow every op
+    # enough to distort the profile, so they are opt-in. For a full
+    # system-level trace, prefer `nsys profile -t cuda,nvtx` instead.
+    profiler_kwargs = {}
+    if cuda_metrics:
+        try:
+            from torch.profiler import _ExperimentalConfig
+
+            profiler_kwargs["experimental_config"] = _ExperimentalConfig(
+                profiler_metrics=["kineto__cuda_core_flops"], verbose=False
+            )
+        except ImportError:
+            print("Warning: this torch build does not expose _ExperimentalConfig; skipping CUDA metrics")
+
+    output_dir = "tb_profile"
     with profile(
         activities=[ProfilerActivity.CPU, ProfilerActivity.CUDA],
-        record_shapes=True,
+        schedule=schedule(wait=1, warmup=2, active=3, repeat=1),
+        on_trace_ready=tensorboard_trace_handler(output_dir),
+        record_shapes=record_shapes,
         profile_memory=True,
-        with_stack=True,
+        with_stack=with_stack,
+        **profiler_kwargs,
     ) as prof:
         for step in range(steps):
+            with record_function("h2d"):
+                x = x_cpu.to(device, non_blocking=True)
+                y = y_cpu.to(device, non_blocking=True)
+
             with record_function("forward"):
                 logits, loss = model(x, y)
 
@@ -54,6 +78,8 @@ def profile_training(config_path: str, steps: int = 10):
                 optimizer.step()
                 optimizer.zero_grad()
 
+            prof.step()
+
     print("\n" + "="*80)
     print("Top 10 operations by CUDA time:")
     print("="*80)
@@ -69,16 +95,17 @@ def profile_training(config_path: str, steps: int = 10):
     print("="*80)
     print(prof.key_averages().table(sort_by="cuda_memory_usage", row_limit=10))
 
-    output_file = "profile_trace.json"
-    prof.export_chrome_trace(output_file)
-    print(f"\nProfile trace saved to {output_file}")
-    print(f"View in Chrome: chrome://tracing")
+    print(f"\nProfile trace saved to {output_dir}/")
+    print(f"View with: tensorboard --logdir {output_dir}")
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Profile GPU training performance")
     parser.add_argument("--config", type=str, required=True, help="Path to config file")
     parser.add_argument("--steps", type=int, default=10, help="Number of steps to profile")
+    parser.add_argument("--with-stack", action="store_true", help="Record Python stack traces (large traces)")
+    parser.add_argument("--record-shapes", action="store_true", help="Record operator input shapes")
+    parser.add_argument("--cuda-metrics", action="store_true", help="Collect kernel-level CUDA metrics via CUPTI")
     args = parser.parse_args()
 
-    profile_training(args.config, args.steps)
+    profile_training(args.config, args.steps, args.with_stack, args.record_shapes, args.cuda_metrics)
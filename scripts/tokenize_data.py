@@ -16,7 +16,9 @@ def process_dataset(dataset_path: Path, output_dir: Path, tokenizer_name: str, n
     dataset = load_from_disk(str(dataset_path))
 
     print(f"Loading tokenizer: {tokenizer_name}")
-    tokenizer = AutoTokenizer.from_pretrained(tokenizer_name)
+    # The Rust fast tokenizer is roughly an order of magnitude faster than
+    # the Python implementation for GPT-2 style BPE.
+    tokenizer = AutoTokenizer.from_pretrained(tokenizer_name, use_fast=True)
 
     print("Tokenizing dataset...")
     tokenized = dataset.map(
@@ -24,23 +26,28 @@ def process_dataset(dataset_path: Path, output_dir: Path, tokenizer_name: str, n
         batched=True,
         num_proc=num_workers,
         remove_columns=dataset.column_names,
+        writer_batch_size=10_000,
         desc="Tokenizing",
     )
 
     output_dir.mkdir(parents=True, exist_ok=True)
 
     print("Converting to binary format...")
-    all_tokens = []
-    for example in tqdm(tokenized, desc="Collecting tokens"):
-        all_tokens.extend(example["input_ids"])
-
-    tokens_array = np.array(all_tokens, dtype=np.uint16)
+    # Read the token ids straight out of the Arrow column: flattening a
+    # list chunk is zero-copy, so nothing is round-tripped through Python.
+    ids_column = tokenized.data.table.column("input_ids")
 
     output_file = output_dir / "data.bin"
-    tokens_array.tofile(str(output_file))
+    total_tokens = 0
+    with open(output_file, "wb", buffering=1 << 22) as f:
+        for chunk in tqdm(ids_column.chunks, desc="Writing tokens", unit="chunk"):
+            flat = chunk.flatten().to_numpy(zero_copy_only=True)
+            tokens = flat.astype(np.uint16, copy=False)
+            tokens.tofile(f)
+            total_tokens += len(tokens)
 
     print(f"Tokenized data saved to {output_file}")
-    print(f"Total tokens: {len(tokens_array):,}")
+    print(f"Total tokens: {total_tokens:,}")
     print(f"File size: {output_file.stat().st_size / (1024**3):.2f} GB")
 
 
@@ -1,3 +1,3 @@
-from .dataset import TextDataset
+from .dataset import FastDistributedSampler, TextDataset
 
-__all__ = ["TextDataset"]
+__all__ = ["FastDistributedSampler", "TextDataset"]
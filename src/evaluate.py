@@ -49,28 +49,44 @@ def load_model(checkpoint_path: str, device: str) -> GPT:
 
 
 def evaluate_perplexity(
-    model: GPT, data_path: str, device: str, max_samples: int = 100
+    model: GPT,
+    data_path: str,
+    device: str,
+    max_samples: int = 100,
+    batch_size: int = 32,
 ) -> float:
+    import mmap
+
     import numpy as np
 
     data = np.memmap(data_path, dtype=np.uint16, mode="r")
+    try:
+        # Windows are read front to back; favor sequential readahead.
+        data._mmap.madvise(mmap.MADV_SEQUENTIAL)
+    except (AttributeError, OSError):
+        pass
     block_size = model.config.block_size
 
-    total_loss = 0.0
-    num_samples = min(max_samples, len(data) // block_size)
-
-    with torch.no_grad():
-        for i in range(num_samples):
-            start_idx = i * block_size
-            end_idx = start_idx + block_size + 1
-            chunk = torch.from_numpy((data[start_idx:end_idx]).astype(np.int64))
-            x = chunk[:-1].unsqueeze(0).to(device)
-            y = chunk[1:].unsqueeze(0).to(device)
+    num_samples = min(max_samples, (len(data) - 1) // block_size)
+    losses = []
+
+    with torch.inference_mode():
+        for i in range(0, num_samples, batch_size):
+            starts = range(i, min(i + batch_size, num_samples))
+            buf = np.stack(
+                [
+                    np.asarray(data[s * block_size : (s + 1) * block_size + 1])
+                    for s in starts
+                ]
+            ).astype(np.int64)
+            xy = torch.from_numpy(buf).to(device, non_blocking=True)
+            x = xy[:, :-1]
+            y = xy[:, 1:]
 
             _, loss = model(x, y)
-            total_loss += loss.item()
+            losses.append(loss.detach())
 
-    avg_loss = total_loss / num_samples
+    avg_loss = torch.stack(losses).mean().item()
     perplexity = torch.exp(torch.tensor(avg_loss)).item()
     return perplexity
 
@@ -102,9 +118,7 @@ def run_evaluation(config_path: str, checkpoint_path: str, output_path: str):
 
     print(f"Loading model from {checkpoint_path}...")
     model = load_model(checkpoint_path, device)
-    print(
-        f"Model loaded: {sum(p.numel() for p in model.parameters())/1e6:.2f}M parameters"
-    )
+    print(f"Model loaded: {model.get_num_params()/1e6:.2f}M parameters")
 
     results: Dict[str, Any] = {}
 
@@ -113,6 +113,13 @@ class GPT(nn.Module):
                     p, mean=0.0, std=0.02 / math.sqrt(2 * config.n_layer)
                 )
 
+        # Cached so callers don't re-walk the parameter tree (which, under
+        # DDP, chases attributes through the wrapper) just to log a banner.
+        self.n_params = sum(p.numel() for p in self.parameters())
+
+    def get_num_params(self):
+        return self.n_params
+
     def _init_weights(self, module):
         if isinstance(module, nn.Linear):
             torch.nn.init.normal_(module.weight, mean=0.0, std=0.02)
@@ -121,7 +128,7 @@ class GPT(nn.Module):
         elif isinstance(module, nn.Embedding):
             torch.nn.init.normal_(module.weight, mean=0.0, std=0.02)
 
-    def forward(self, idx, targets=None):
+    def forward(self, idx, targets=None, return_logits=True):
         device = idx.device
         b, t = idx.size()
         assert (
@@ -141,13 +148,19 @@ class GPT(nn.Module):
             loss = F.cross_entropy(
                 logits.view(-1, logits.size(-1)), targets.view(-1), ignore_index=-1
             )
+            if not return_logits:
+                # Training loops that only backprop the loss don't need the
+                # (B, T, vocab) logits kept alive as an output.
+                logits = None
         else:
             logits = self.lm_head(x[:, [-1], :])
             loss = None
 
         return logits, loss
 
-    def configure_optimizers(self, weight_decay, learning_rate, betas, device_type):
+    def configure_optimizers(
+        self, weight_decay, learning_rate, betas, device_type, fused=None
+    ):
         param_dict = {pn: p for pn, p in self.named_parameters() if p.requires_grad}
         decay_params = [p for n, p in param_dict.items() if p.dim() >= 2]
         nodecay_params = [p for n, p in param_dict.items() if p.dim() < 2]
@@ -155,10 +168,13 @@ class GPT(nn.Module):
             {"params": decay_params, "weight_decay": weight_decay},
             {"params": nodecay_params, "weight_decay": 0.0},
         ]
-        use_fused = (device_type == "cuda") and (
-            "fused" in torch.optim.AdamW.__init__.__code__.co_varnames
-        )
-        extra_args = dict(fused=True) if use_fused else dict()
+        # Fused AdamW updates every parameter in one CUDA kernel instead
+        # of one launch per tensor; auto-detect unless the caller decides.
+        if fused is None:
+            fused = (device_type == "cuda") and (
+                "fused" in torch.optim.AdamW.__init__.__code__.co_varnames
+            )
+        extra_args = dict(fused=True) if fused else dict()
         optimizer = torch.optim.AdamW(
             optim_groups, lr=learning_rate, betas=betas, **extra_args
         )
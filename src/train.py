@@ -1,18 +1,28 @@
 import os
+import queue
+import sys
+import threading
 import time
 import math
 import argparse
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import nullcontext
 from pathlib import Path
 
+import numpy as np
 import torch
 import torch.distributed as dist
 from torch.nn.parallel import DistributedDataParallel as DDP
-from torch.utils.data import DataLoader, DistributedSampler
+from torch.utils.data import DataLoader
 import yaml
 
+try:
+    from yaml import CSafeLoader as YamlLoader
+except ImportError:
+    from yaml import SafeLoader as YamlLoader
+
 from src.models.gpt import GPT, GPTConfig
-from src.data.dataset import TextDataset
+from src.data.dataset import FastDistributedSampler, TextDataset
 
 try:
     from python.runfiles import runfiles
@@ -59,10 +69,22 @@ def get_lr(it, warmup_iters, learning_rate, lr_decay_iters, min_lr):
     return min_lr + coeff * (learning_rate - min_lr)
 
 
+def build_lr_schedule(max_iters, warmup_iters, learning_rate, lr_decay_iters, min_lr):
+    """Vectorized get_lr over every iteration, computed once at startup."""
+    its = np.arange(max_iters, dtype=np.float64)
+    decay_ratio = np.clip(
+        (its - warmup_iters) / (lr_decay_iters - warmup_iters), 0.0, 1.0
+    )
+    decayed = min_lr + 0.5 * (1.0 + np.cos(np.pi * decay_ratio)) * (
+        learning_rate - min_lr
+    )
+    return np.where(its < warmup_iters, learning_rate * its / warmup_iters, decayed)
+
+
 def train(config_path: str):
     resolved_config_path = resolve_path(config_path)
     with open(resolved_config_path, "r") as f:
-        config = yaml.safe_load(f)
+        config = yaml.load(f, Loader=YamlLoader)
 
     rank, world_size, local_rank = setup_distributed()
     is_master = rank == 0
@@ -73,6 +95,13 @@ def train(config_path: str):
     device = f"cuda:{local_rank}" if torch.cuda.is_available() else "cpu"
     device_type = "cuda" if "cuda" in device else "cpu"
 
+    if device_type == "cuda":
+        # Shapes are static (drop_last=True), so cudnn's one-time algo
+        # search pays for itself; "high" routes fp32 matmuls through TF32
+        # tensor cores.
+        torch.backends.cudnn.benchmark = True
+        torch.set_float32_matmul_precision("high")
+
     ptdtype = {
         "float32": torch.float32,
         "bfloat16": torch.bfloat16,
@@ -89,17 +118,30 @@ def train(config_path: str):
     model.to(device)
 
     if world_size > 1:
-        model = DDP(model, device_ids=[local_rank])
+        # Gradients as views into the flat all-reduce buckets saves one
+        # model-sized memcpy per step, and the fixed GPT graph lets DDP
+        # skip per-iteration autograd hook bookkeeping.
+        model = DDP(
+            model,
+            device_ids=[local_rank],
+            gradient_as_bucket_view=True,
+            bucket_cap_mb=50,
+            static_graph=True,
+        )
     raw_model = model.module if isinstance(model, DDP) else model
 
-    scaler = torch.amp.GradScaler(
-        device_type, enabled=(config["training"]["dtype"] == "float16")
-    )
+    if config["training"].get("compile", False) and device_type == "cuda":
+        model = torch.compile(model, mode="reduce-overhead", fullgraph=False)
+
+    # Only fp16 needs loss scaling; bf16 keeps fp32's exponent range.
+    use_scaler = config["training"]["dtype"] == "float16"
+    scaler = torch.amp.GradScaler(device_type, enabled=use_scaler)
     optimizer = raw_model.configure_optimizers(
         weight_decay=config["training"]["weight_decay"],
         learning_rate=config["training"]["learning_rate"],
         betas=(config["training"]["beta1"], config["training"]["beta2"]),
         device_type=device_type,
+        fused=config["training"].get("fused_adamw", None),
     )
 
     train_dataset = TextDataset(
@@ -108,103 +150,289 @@ def train(config_path: str):
     )
 
     sampler = (
-        DistributedSampler(train_dataset, num_replicas=world_size, rank=rank)
+        FastDistributedSampler(train_dataset, num_replicas=world_size, rank=rank)
         if world_size > 1
         else None
     )
+    num_workers = config["training"]["num_workers"]
+    prefetch_factor = config["training"].get("prefetch_factor", 2)
+
+    # Pinned memory grows with num_workers * prefetch_factor queued
+    # batches; warn before it quietly eats host RAM.
+    sample_bytes = 4 * (model_config.block_size + 1)
+    queued_bytes = (
+        num_workers * prefetch_factor * config["training"]["batch_size"] * sample_bytes
+    )
+    if is_master and queued_bytes > 1 << 30:
+        print(
+            f"Warning: DataLoader will pin ~{queued_bytes / (1024**3):.1f} GB "
+            f"(num_workers * prefetch_factor * batch); consider lowering prefetch_factor"
+        )
+
     train_loader = DataLoader(
         train_dataset,
         batch_size=config["training"]["batch_size"],
         sampler=sampler,
-        num_workers=config["training"]["num_workers"],
+        shuffle=sampler is None,
+        num_workers=num_workers,
         pin_memory=True,
+        persistent_workers=num_workers > 0,
+        prefetch_factor=prefetch_factor if num_workers > 0 else None,
+        drop_last=True,
+        collate_fn=train_dataset.collate,
     )
 
     output_dir = Path(config["training"]["output_dir"])
     output_dir.mkdir(parents=True, exist_ok=True)
 
+    # Checkpoint serialization happens off the training thread; the loop
+    # only pays for the device-to-host copy of the state dict.
+    ckpt_pool = ThreadPoolExecutor(max_workers=1)
+    pending_ckpt = None
+
+    # Preallocated (pinned, on CUDA) host buffers for the state dict:
+    # interval checkpoints copy_ into these instead of allocating one
+    # CPU tensor per parameter every save.
+    cpu_state = None
+    if is_master:
+        cpu_state = {}
+        for k, v in raw_model.state_dict().items():
+            t = torch.empty_like(v, device="cpu")
+            if device_type == "cuda":
+                t = t.pin_memory()
+            cpu_state[k] = t
+
+    # Hot-loop log lines are handed to a daemon thread so stdout flushes
+    # (which may go through tee to a file) never stall the train step.
+    log_q = queue.SimpleQueue()
+
+    def _log_writer():
+        while True:
+            msg = log_q.get()
+            if msg is None:
+                break
+            sys.stdout.write(msg)
+            sys.stdout.flush()
+
+    log_thread = threading.Thread(target=_log_writer, daemon=True)
+    log_thread.start()
+
     iter_num = 0
-    running_loss = 0.0
+    # Accumulated on device; a per-step .item() would synchronize the
+    # stream every iteration.
+    loss_accum = torch.zeros((), device=device)
 
     if is_master:
         print(
-            f"Training GPT model with {sum(p.numel() for p in model.parameters())/1e6:.2f}M parameters"
+            f"Training GPT model with {raw_model.get_num_params()/1e6:.2f}M parameters"
         )
         print(
             f"World size: {world_size}, Device: {device}, dtype: {config['training']['dtype']}"
         )
 
-    model.train()
-    t0 = time.time()
+    lr_schedule = build_lr_schedule(
+        config["training"]["max_iters"],
+        config["training"]["warmup_iters"],
+        config["training"]["learning_rate"],
+        config["training"]["lr_decay_iters"],
+        config["training"]["min_lr"],
+    )
+    last_lr = -1.0
 
-    for epoch in range(config["training"]["max_epochs"]):
-        if sampler:
-            sampler.set_epoch(epoch)
+    # Hot-loop config fields as locals: LOAD_FAST beats two chained dict
+    # lookups per iteration.
+    grad_accum_steps = config["training"]["gradient_accumulation_steps"]
+    grad_clip = config["training"]["grad_clip"]
+    log_interval = config["training"]["log_interval"]
+    eval_interval = config["training"]["eval_interval"]
+    max_iters = config["training"]["max_iters"]
+    param_groups = optimizer.param_groups
 
-        for batch_idx, (x, y) in enumerate(train_loader):
-            x, y = x.to(device), y.to(device)
+    model.train()
 
-            lr = get_lr(
-                iter_num,
-                config["training"]["warmup_iters"],
-                config["training"]["learning_rate"],
-                config["training"]["lr_decay_iters"],
-                config["training"]["min_lr"],
-            )
-            for param_group in optimizer.param_groups:
-                param_group["lr"] = lr
+    # Optional CUDA graph capture of forward+backward: one graph launch
+    # replaces thousands of per-iteration kernel launches. The optimizer
+    # step stays eager so the LR schedule and grad clipping still apply.
+    # Only safe when every iteration is identical: single GPU, no
+    # gradient accumulation, no GradScaler, and not already under
+    # torch.compile (whose reduce-overhead mode graphs on its own).
+    use_cuda_graphs = (
+        config["training"].get("cuda_graphs", False)
+        and device_type == "cuda"
+        and world_size == 1
+        and grad_accum_steps == 1
+        and not use_scaler
+        and not config["training"].get("compile", False)
+    )
+    train_graph = None
+    if use_cuda_graphs:
+        static_x = torch.zeros(
+            (config["training"]["batch_size"], model_config.block_size),
+            dtype=torch.long,
+            device=device,
+        )
+        static_y = torch.zeros_like(static_x)
 
-            with ctx:
-                logits, loss = model(x, y)
-                loss = loss / config["training"]["gradient_accumulation_steps"]
+        # torch.cuda.graph requires autocast's weight cache disabled
+        # during capture (and warmup must match the captured region).
+        graph_ctx = torch.amp.autocast(
+            device_type="cuda", dtype=ptdtype, cache_enabled=False
+        )
 
-            scaler.scale(loss).backward()
+        warmup_stream = torch.cuda.Stream()
+        warmup_stream.wait_stream(torch.cuda.current_stream())
+        with torch.cuda.stream(warmup_stream):
+            for _ in range(3):
+                with graph_ctx:
+                    _, warm_loss = model(static_x, static_y, return_logits=False)
+                warm_loss.backward()
+                # Warmup mirrors the captured region exactly: no
+                # optimizer.step, so the all-zero token batches never
+                # touch the freshly initialized weights. Graph replay
+                # writes into the existing grad tensors, so they must
+                # keep their storage.
+                optimizer.zero_grad(set_to_none=False)
+        torch.cuda.current_stream().wait_stream(warmup_stream)
+
+        train_graph = torch.cuda.CUDAGraph()
+        with torch.cuda.graph(train_graph):
+            with graph_ctx:
+                _, static_loss = model(static_x, static_y, return_logits=False)
+            static_loss.backward()
 
-            if (batch_idx + 1) % config["training"]["gradient_accumulation_steps"] == 0:
-                if config["training"]["grad_clip"] != 0.0:
-                    scaler.unscale_(optimizer)
-                    torch.nn.utils.clip_grad_norm_(
-                        model.parameters(), config["training"]["grad_clip"]
-                    )
+    t0 = time.time()
 
-                scaler.step(optimizer)
-                scaler.update()
-                optimizer.zero_grad(set_to_none=True)
+    for epoch in range(config["training"]["max_epochs"]):
+        if sampler:
+            sampler.set_epoch(epoch)
 
-            running_loss += loss.item()
+        for batch_idx, batch in enumerate(train_loader):
+            # Pinned source + non_blocking lets the H2D DMA overlap the
+            # previous iteration's compute.
+            batch = batch.to(device, non_blocking=True).long()
+            x, y = batch[:, :-1], batch[:, 1:]
+
+            lr = (
+                float(lr_schedule[iter_num])
+                if iter_num < len(lr_schedule)
+                else get_lr(
+                    iter_num,
+                    config["training"]["warmup_iters"],
+                    config["training"]["learning_rate"],
+                    config["training"]["lr_decay_iters"],
+                    config["training"]["min_lr"],
+                )
+            )
+            if lr != last_lr:
+                for param_group in param_groups:
+                    param_group["lr"] = lr
+                last_lr = lr
+
+            is_accum_boundary = (batch_idx + 1) % grad_accum_steps == 0
+
+            # Under DDP, only the final micro-step of the accumulation
+            # window needs the gradient all-reduce.
+            sync_ctx = (
+                model.no_sync()
+                if world_size > 1 and not is_accum_boundary
+                else nullcontext()
+            )
 
-            if iter_num % config["training"]["log_interval"] == 0 and is_master:
+            if train_graph is not None:
+                static_x.copy_(x, non_blocking=True)
+                static_y.copy_(y, non_blocking=True)
+                train_graph.replay()
+                loss = static_loss
+            else:
+                with sync_ctx:
+                    with ctx:
+                        _, loss = model(x, y, return_logits=False)
+                        loss = loss / grad_accum_steps
+
+                    if use_scaler:
+                        scaler.scale(loss).backward()
+                    else:
+                        loss.backward()
+
+            if is_accum_boundary:
+                if use_scaler:
+                    if grad_clip != 0.0:
+                        scaler.unscale_(optimizer)
+                        torch.nn.utils.clip_grad_norm_(model.parameters(), grad_clip)
+                    scaler.step(optimizer)
+                    scaler.update()
+                else:
+                    if grad_clip != 0.0:
+                        torch.nn.utils.clip_grad_norm_(model.parameters(), grad_clip)
+                    optimizer.step()
+                optimizer.zero_grad(set_to_none=not use_cuda_graphs)
+
+            loss_accum += loss.detach()
+
+            if iter_num % log_interval == 0 and is_master:
                 t1 = time.time()
                 dt = t1 - t0
-                lossf = running_loss / config["training"]["log_interval"]
-                print(
-                    f"iter {iter_num}: loss {lossf:.4f}, lr {lr:.6f}, time {dt*1000:.2f}ms"
+                lossf = (loss_accum / log_interval).item()
+                log_q.put(
+                    f"iter {iter_num}: loss {lossf:.4f}, lr {lr:.6f}, time {dt*1000:.2f}ms\n"
                 )
-                running_loss = 0.0
+                loss_accum.zero_()
                 t0 = t1
 
-            if iter_num % config["training"]["eval_interval"] == 0 and iter_num > 0:
+            if iter_num % eval_interval == 0 and iter_num > 0:
                 if is_master:
+                    # Don't overwrite the shared host buffers while the
+                    # previous save is still serializing them.
+                    if pending_ckpt is not None:
+                        pending_ckpt.result()
+                    for k, v in raw_model.state_dict().items():
+                        cpu_state[k].copy_(v, non_blocking=True)
+                    # The optimizer moments are live CUDA tensors that
+                    # keep mutating under optimizer.step(); snapshot them
+                    # to host so the async save only touches immutable
+                    # memory.
+                    opt_state = optimizer.state_dict()
+                    opt_state["state"] = {
+                        k: {
+                            sk: (
+                                sv.to("cpu", non_blocking=True)
+                                if torch.is_tensor(sv)
+                                else sv
+                            )
+                            for sk, sv in s.items()
+                        }
+                        for k, s in opt_state["state"].items()
+                    }
+                    if device_type == "cuda":
+                        torch.cuda.synchronize()
                     checkpoint = {
-                        "model": raw_model.state_dict(),
-                        "optimizer": optimizer.state_dict(),
+                        "model": cpu_state,
+                        "optimizer": opt_state,
                         "iter_num": iter_num,
                         "config": config,
                     }
                     checkpoint_path = output_dir / f"checkpoint_{iter_num}.pt"
-                    torch.save(checkpoint, checkpoint_path)
-                    print(f"Saved checkpoint to {checkpoint_path}")
+                    pending_ckpt = ckpt_pool.submit(
+                        torch.save, checkpoint, checkpoint_path, pickle_protocol=5
+                    )
+                    log_q.put(f"Saving checkpoint to {checkpoint_path}\n")
 
             iter_num += 1
-            if iter_num >= config["training"]["max_iters"]:
+            if iter_num >= max_iters:
                 break
 
-        if iter_num >= config["training"]["max_iters"]:
+        if iter_num >= max_iters:
             break
 
+    # Drain the log queue, then wait for any in-flight checkpoint before
+    # the final synchronous save.
+    log_q.put(None)
+    log_thread.join()
+    ckpt_pool.shutdown(wait=True)
+
     if is_master:
         final_checkpoint = output_dir / "final_model.pt"
-        torch.save(raw_model.state_dict(), final_checkpoint)
+        torch.save(raw_model.state_dict(), final_checkpoint, pickle_protocol=5)
         print(f"Training complete. Final model saved to {final_checkpoint}")
 
     cleanup_distributed()
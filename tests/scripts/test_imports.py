@@ -7,8 +7,7 @@ import sys
 
 def check_version(package_name, current_version, min_version):
     """Check if current version meets minimum requirement."""
-    from packaging import version
-    if version.parse(current_version) >= version.parse(min_version):
+    if Version(current_version) >= min_version:
         print(f"✓ {package_name}: {current_version} (>= {min_version})")
         return True
     else:
@@ -22,7 +21,8 @@ try:
     import black
     import pyarrow
     import tqdm
-    from packaging import version
+
+    from packaging.version import Version
 
     print("=" * 60)
     print("Package Import Verification")
@@ -33,12 +33,18 @@ try:
     print("Version Requirements Check:")
     print("-" * 60)
 
+    # Parse each minimum version exactly once.
+    checks = [
+        ("torch", torch.__version__, Version("2.2.0")),
+        ("transformers", transformers.__version__, Version("4.53.0")),
+        ("black", black.__version__, Version("24.3.0")),
+        ("pyarrow", pyarrow.__version__, Version("15.0.0")),
+        ("tqdm", tqdm.__version__, Version("4.66.5")),
+    ]
+
     all_pass = True
-    all_pass &= check_version("torch", torch.__version__, "2.2.0")
-    all_pass &= check_version("transformers", transformers.__version__, "4.53.0")
-    all_pass &= check_version("black", black.__version__, "24.3.0")
-    all_pass &= check_version("pyarrow", pyarrow.__version__, "15.0.0")
-    all_pass &= check_version("tqdm", tqdm.__version__, "4.66.5")
+    for package_name, current_version, min_version in checks:
+        all_pass &= check_version(package_name, current_version, min_version)
 
     print("-" * 60)
 